@@ -1,12 +1,20 @@
 import streamlit as st
 import os
-import google.generativeai as genai
 import requests
-from firecrawl import FirecrawlApp
-from pydantic import BaseModel, Field
+from dataclasses import asdict, dataclass, field, is_dataclass
 from typing import List, Optional
+import asyncio
+import atexit
+import collections
+import concurrent.futures
+import functools
+import hashlib
 import json
+import queue
+import random
 import re
+import threading
+import time
 import logging
 logger = logging.getLogger("leadai")
 if not logger.handlers:
@@ -14,23 +22,149 @@ if not logger.handlers:
     _h.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
     logger.addHandler(_h)
 logger.setLevel(logging.INFO)
-from composio_phidata import Action, ComposioToolSet
+try:
+    import orjson
 
-class QuoraUserInteractionSchema(BaseModel):
-    username: str = Field(description="The username of the user who posted the question or answer")
-    bio: str = Field(description="The bio or description of the user")
-    post_type: str = Field(description="The type of post, either 'question' or 'answer'")
-    timestamp: str = Field(description="When the question or answer was posted")
-    upvotes: int = Field(default=0, description="Number of upvotes received")
-    links: List[str] = Field(default_factory=list, description="Any links included in the post")
+    def _json_dumps(obj: object) -> str:
+        return orjson.dumps(obj, default=str).decode()
 
-class QuoraPageSchema(BaseModel):
-    interactions: List[QuoraUserInteractionSchema] = Field(description="List of all user interactions (questions and answers) on the page")
+    def _json_dumps_bytes(obj: object) -> bytes:
+        return orjson.dumps(obj, default=str)
 
-def search_for_urls(company_description: str, firecrawl_api_key: str, num_links: int) -> List[str]:
+    def _json_loads(data) -> object:
+        return orjson.loads(data)
+except ImportError:
+    def _json_dumps(obj: object) -> str:
+        return json.dumps(obj, default=str)
+
+    def _json_dumps_bytes(obj: object) -> bytes:
+        return json.dumps(obj, default=str).encode()
+
+    def _json_loads(data) -> object:
+        return json.loads(data)
+
+# Shared keep-alive session so repeated Firecrawl calls reuse TCP/TLS
+# connections instead of paying a fresh handshake per request.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    requests.adapters.HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        max_retries=requests.adapters.Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "POST"],
+        ),
+    ),
+)
+
+# Circuit breaker for Firecrawl: after repeated failures in a short window,
+# stop issuing calls for a cooldown instead of letting every worker spin
+# through retries against a struggling endpoint.
+_BREAKER_WINDOW_S = 60.0
+_BREAKER_FAILURE_THRESHOLD = 5
+_BREAKER_COOLDOWN_S = 30.0
+_breaker_lock = threading.Lock()
+_breaker_failures: "collections.deque" = collections.deque()
+_breaker_open_until = 0.0
+
+
+def _breaker_is_open() -> bool:
+    return time.monotonic() < _breaker_open_until
+
+
+def _breaker_record_failure() -> None:
+    global _breaker_open_until
+    now = time.monotonic()
+    with _breaker_lock:
+        _breaker_failures.append(now)
+        while _breaker_failures and now - _breaker_failures[0] > _BREAKER_WINDOW_S:
+            _breaker_failures.popleft()
+        if len(_breaker_failures) >= _BREAKER_FAILURE_THRESHOLD:
+            _breaker_open_until = now + _BREAKER_COOLDOWN_S
+            _breaker_failures.clear()
+            logger.warning("Firecrawl circuit breaker opened for %.0fs", _BREAKER_COOLDOWN_S)
+
+
+def _breaker_record_success() -> None:
+    with _breaker_lock:
+        _breaker_failures.clear()
+
+
+_FIRECRAWL_APPS: dict = {}
+
+
+def _get_firecrawl_app(api_key: str) -> "FirecrawlApp":
+    """Reuse one FirecrawlApp per API key so its HTTP client keeps its connection pool."""
+    app = _FIRECRAWL_APPS.get(api_key)
+    if app is None:
+        # Deferred: the SDK import is heavy and only needed once extraction runs
+        from firecrawl import FirecrawlApp
+        app = FirecrawlApp(api_key=api_key)
+        _FIRECRAWL_APPS[api_key] = app
+    return app
+
+@dataclass
+class QuoraUserInteractionSchema:
+    username: str = ""
+    bio: str = ""
+    post_type: str = ""
+    timestamp: str = ""
+    upvotes: int = 0
+    links: List[str] = field(default_factory=list)
+
+@dataclass
+class QuoraPageSchema:
+    interactions: List[dict] = field(default_factory=list)
+
+# Static JSON schema sent to Firecrawl's extract endpoint. The schemas above
+# never change at runtime, so this is a precomputed literal rather than a
+# per-call pydantic model_json_schema() build.
+_QUORA_PAGE_JSON_SCHEMA = {
+    "$defs": {
+        "QuoraUserInteractionSchema": {
+            "type": "object",
+            "title": "QuoraUserInteractionSchema",
+            "properties": {
+                "username": {"type": "string", "description": "The username of the user who posted the question or answer"},
+                "bio": {"type": "string", "description": "The bio or description of the user"},
+                "post_type": {"type": "string", "description": "The type of post, either 'question' or 'answer'"},
+                "timestamp": {"type": "string", "description": "When the question or answer was posted"},
+                "upvotes": {"type": "integer", "default": 0, "description": "Number of upvotes received"},
+                "links": {"type": "array", "items": {"type": "string"}, "description": "Any links included in the post"},
+            },
+            "required": ["username", "bio", "post_type", "timestamp"],
+        }
+    },
+    "type": "object",
+    "title": "QuoraPageSchema",
+    "properties": {
+        "interactions": {
+            "type": "array",
+            "items": {"$ref": "#/$defs/QuoraUserInteractionSchema"},
+            "description": "List of all user interactions (questions and answers) on the page",
+        }
+    },
+    "required": ["interactions"],
+}
+
+_QUORA_EXTRACT_PROMPT = (
+    "Extract all user information including username, bio, post type (question/answer), "
+    "timestamp, upvotes, and any links from Quora posts. Focus on identifying potential "
+    "leads who are asking questions or providing answers related to the topic."
+)
+
+# The leading underscore on _firecrawl_api_key keeps the secret out of the
+# cache key; results are keyed on (company_description, num_links) only.
+# Failures raise rather than return [] — st.cache_data caches return values
+# but not exceptions, so a transient error never poisons the hour-long TTL.
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=128)
+def search_for_urls(company_description: str, _firecrawl_api_key: str, num_links: int) -> List[str]:
     url = "https://api.firecrawl.dev/v1/search"
     headers = {
-        "Authorization": f"Bearer {firecrawl_api_key}",
+        "Authorization": f"Bearer {_firecrawl_api_key}",
         "Content-Type": "application/json"
     }
     query1 = f"quora websites where people are looking for {company_description} services"
@@ -41,136 +175,483 @@ def search_for_urls(company_description: str, firecrawl_api_key: str, num_links:
         "location": "United States",
         "timeout": 60000,
     }
-    response = requests.post(url, json=payload, headers=headers)
-    if response.status_code == 200:
-        data = response.json()
-        if data.get("success"):
-            results = data.get("data", [])
-            return [result["url"] for result in results]
-    return []
-
-def extract_user_info_from_urls(urls: List[str], firecrawl_api_key: str) -> List[dict]:
-    user_info_list = []
-    firecrawl_app = FirecrawlApp(api_key=firecrawl_api_key)
-    
-    try:
-        for url in urls:
+    response = _SESSION.post(url, json=payload, headers=headers, timeout=(5, 60))
+    response.raise_for_status()
+    data = response.json()
+    if not data.get("success"):
+        raise RuntimeError(f"Firecrawl search failed: {data.get('error', 'unknown error')}")
+    results = data.get("data", [])
+    return [result["url"] for result in results]
+
+def _extract_single_url(firecrawl_app: "FirecrawlApp", url: str, max_attempts: int = 3) -> Optional[dict]:
+    """Extract interactions from one URL, retrying with exponential backoff and jitter."""
+    for attempt in range(max_attempts):
+        if _breaker_is_open():
+            logger.warning("Skipping %s: Firecrawl circuit breaker is open", url)
+            return None
+        try:
             response = firecrawl_app.extract(
                 [url],
                 {
-                    'prompt': 'Extract all user information including username, bio, post type (question/answer), timestamp, upvotes, and any links from Quora posts. Focus on identifying potential leads who are asking questions or providing answers related to the topic.',
-                    'schema': QuoraPageSchema.model_json_schema(),
+                    'prompt': _QUORA_EXTRACT_PROMPT,
+                    'schema': _QUORA_PAGE_JSON_SCHEMA,
                 }
             )
-            
+            _breaker_record_success()
             if response.get('success') and response.get('status') == 'completed':
                 interactions = response.get('data', {}).get('interactions', [])
                 if interactions:
-                    user_info_list.append({
+                    return {
                         "website_url": url,
                         "user_info": interactions
-                    })
+                    }
+            return None
+        except Exception:
+            _breaker_record_failure()
+            if attempt == max_attempts - 1:
+                logger.exception("Extraction failed for %s after %d attempts", url, max_attempts)
+                return None
+            time.sleep((2 ** attempt) * 0.5 + random.uniform(0, 0.5))
+    return None
+
+
+# Batch size for the chunked middle tier when a full multi-URL extract
+# is rejected or unattributable
+_EXTRACT_BATCH_CHUNK = 5
+
+
+def _extract_batched(firecrawl_app: "FirecrawlApp", urls: List[str]) -> Optional[List[dict]]:
+    """Extract all URLs in one Firecrawl call; None if the response can't be attributed per URL."""
+    if _breaker_is_open():
+        logger.warning("Skipping batched extract: Firecrawl circuit breaker is open")
+        return None
+    try:
+        response = firecrawl_app.extract(
+            urls,
+            {
+                'prompt': _QUORA_EXTRACT_PROMPT,
+                'schema': _QUORA_PAGE_JSON_SCHEMA,
+            }
+        )
     except Exception:
-        pass
-    
-    return user_info_list
+        _breaker_record_failure()
+        logger.exception("Batched Firecrawl extract failed for %d URLs", len(urls))
+        return None
 
-def format_user_info_to_flattened_json(user_info_list: List[dict]) -> List[dict]:
-    flattened_data = []
-    
+    _breaker_record_success()
+    if not (isinstance(response, dict) and response.get('success') and response.get('status') == 'completed'):
+        return None
+
+    data = response.get('data')
+    user_info_list: List[dict] = []
+    if isinstance(data, dict):
+        # Single merged page result: only attributable when one URL was sent
+        interactions = data.get('interactions')
+        if interactions and len(urls) == 1:
+            return [{"website_url": urls[0], "user_info": interactions}]
+        # Some responses key results by URL
+        for url in urls:
+            entry = data.get(url)
+            if isinstance(entry, dict) and entry.get('interactions'):
+                user_info_list.append({"website_url": url, "user_info": entry['interactions']})
+        return user_info_list or None
+    if isinstance(data, list):
+        for idx, entry in enumerate(data):
+            if not isinstance(entry, dict):
+                continue
+            url = entry.get('url') or entry.get('website_url') or (urls[idx] if idx < len(urls) else None)
+            interactions = entry.get('interactions')
+            if not interactions and isinstance(entry.get('data'), dict):
+                interactions = entry['data'].get('interactions')
+            if url and interactions:
+                user_info_list.append({"website_url": url, "user_info": interactions})
+        return user_info_list or None
+    return None
+
+
+def _extract_concurrently(firecrawl_app: "FirecrawlApp", urls: List[str], progress_callback=None) -> List[dict]:
+    """Fan the per-URL extractions out over a bounded thread pool.
+
+    Failures are isolated per URL, and progress_callback (if given) is invoked
+    from this thread as each future completes, so it is safe to update
+    Streamlit widgets from it.
+    """
+    results: dict = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(10, len(urls))) as ex:
+        futures = {ex.submit(_extract_single_url, firecrawl_app, url): url for url in urls}
+        done = 0
+        for future in concurrent.futures.as_completed(futures):
+            done += 1
+            try:
+                result = future.result()
+            except Exception:
+                logger.exception("Extraction worker failed for %s", futures[future])
+                result = None
+            if result:
+                results[futures[future]] = result
+            if progress_callback is not None:
+                progress_callback(done, len(urls))
+    # Preserve the original URL order and drop failures/empties
+    return [results[url] for url in urls if url in results]
+
+
+# Extraction is the most expensive stage, so repeat runs within the TTL
+# should not re-pay it. The key and callback are underscore-prefixed to
+# stay out of the cache hash; results are keyed on the URL tuple only.
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=32)
+def _extract_user_info_cached(url_key: tuple, _firecrawl_api_key: str, _progress_callback=None) -> List[dict]:
+    urls = list(url_key)
+    firecrawl_app = _get_firecrawl_app(_firecrawl_api_key)
+    # Prefer one multi-URL extract call so Firecrawl batches the work
+    # server-side and we pay API overhead once instead of N times.
+    batched = _extract_batched(firecrawl_app, urls)
+    if batched is not None:
+        if _progress_callback is not None:
+            _progress_callback(len(urls), len(urls))
+        return batched
+    # Middle tier: if the provider balked at the full batch, try smaller
+    # batches concurrently before giving up on batching altogether.
+    if len(urls) > _EXTRACT_BATCH_CHUNK:
+        chunks = [urls[i:i + _EXTRACT_BATCH_CHUNK] for i in range(0, len(urls), _EXTRACT_BATCH_CHUNK)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(5, len(chunks))) as ex:
+            chunk_results = list(ex.map(lambda chunk: _extract_batched(firecrawl_app, chunk), chunks))
+        user_info_list: List[dict] = []
+        leftover: List[str] = []
+        for chunk, result in zip(chunks, chunk_results):
+            if result is None:
+                leftover.extend(chunk)
+            else:
+                user_info_list.extend(result)
+        if leftover:
+            user_info_list.extend(_extract_concurrently(firecrawl_app, leftover))
+        if _progress_callback is not None:
+            _progress_callback(len(urls), len(urls))
+        return user_info_list
+    # Fall back to a concurrent per-URL fan-out; each call is a multi-second
+    # network round trip, so wall time collapses to roughly the slowest URL.
+    return _extract_concurrently(firecrawl_app, urls, progress_callback=_progress_callback)
+
+
+def extract_user_info_from_urls(urls: List[str], firecrawl_api_key: str, progress_callback=None) -> List[dict]:
+    # Search can return the same thread more than once (redirects, overlapping
+    # queries); extracting a URL twice wastes the most expensive step. Sorting
+    # makes the cache key order-independent, so reshuffled search results
+    # still hit the cached extraction.
+    url_key = tuple(sorted(dict.fromkeys(urls)))
+    return _extract_user_info_cached(url_key, firecrawl_api_key, _progress_callback=progress_callback)
+
+# Below this row count the plain Python loop wins; above it pandas'
+# C-level flattening pays for its import and setup.
+_PANDAS_FLATTEN_THRESHOLD = 64
+
+
+def _flatten_with_pandas(rows: List[dict]) -> List[dict]:
+    import pandas as pd
+
+    df = pd.json_normalize(rows)
+    for col in ("username", "bio", "post_type", "timestamp"):
+        df[col] = df[col].fillna("") if col in df.columns else ""
+    df["upvotes"] = df["upvotes"].fillna(0).astype(int) if "upvotes" in df.columns else 0
+    df["links"] = df["links"].str.join(", ").fillna("") if "links" in df.columns else ""
+    df = df.rename(columns={
+        "website_url": "Website URL",
+        "username": "Username",
+        "bio": "Bio",
+        "post_type": "Post Type",
+        "timestamp": "Timestamp",
+        "upvotes": "Upvotes",
+        "links": "Links",
+    })
+    columns = ["Website URL", "Username", "Bio", "Post Type", "Timestamp", "Upvotes", "Links"]
+    return df[columns].to_dict("records")
+
+
+# Above this row count, building columns directly (structure-of-arrays)
+# beats json_normalize over intermediate row dicts.
+_COLUMNAR_FLATTEN_THRESHOLD = 4096
+
+
+def _flatten_columnar(user_info_list: List[dict], total: int) -> List[dict]:
+    """Single-pass columnar flatten for very large batches.
+
+    Filling preallocated per-column lists skips the intermediate row dicts
+    entirely (no per-row dict header or key hashing until the final records
+    conversion), roughly halving peak memory versus the row-dict path.
+    """
+    import pandas as pd
+
+    website_urls = [None] * total
+    usernames = [None] * total
+    bios = [None] * total
+    post_types = [None] * total
+    timestamps = [None] * total
+    upvotes = [0] * total
+    links_joined = [None] * total
+
+    i = 0
+    get = dict.get
     for info in user_info_list:
-        website_url = info["website_url"]
-        user_info = info["user_info"]
-        
-        for interaction in user_info:
-            flattened_interaction = {
-                "Website URL": website_url,
-                "Username": interaction.get("username", ""),
-                "Bio": interaction.get("bio", ""),
-                "Post Type": interaction.get("post_type", ""),
-                "Timestamp": interaction.get("timestamp", ""),
-                "Upvotes": interaction.get("upvotes", 0),
-                "Links": ", ".join(interaction.get("links", [])),
-            }
-            flattened_data.append(flattened_interaction)
-    
-    return flattened_data
+        url = info["website_url"]
+        for interaction in info["user_info"]:
+            website_urls[i] = url
+            usernames[i] = get(interaction, "username", "")
+            bios[i] = get(interaction, "bio", "")
+            post_types[i] = get(interaction, "post_type", "")
+            timestamps[i] = get(interaction, "timestamp", "")
+            upvotes[i] = get(interaction, "upvotes", 0)
+            links = get(interaction, "links")
+            links_joined[i] = ", ".join(links) if links else ""
+            i += 1
+
+    df = pd.DataFrame({
+        "Website URL": website_urls,
+        "Username": usernames,
+        "Bio": bios,
+        "Post Type": post_types,
+        "Timestamp": timestamps,
+        "Upvotes": upvotes,
+        "Links": links_joined,
+    })
+    return df.to_dict("records")
+
+
+def _build_csv(flattened_data: List[dict]) -> str:
+    """Serialize flattened rows to CSV text for the download fallback."""
+    import csv
+    import io
+    from operator import itemgetter
+
+    buf = io.StringIO()
+    if len(flattened_data) >= _PANDAS_FLATTEN_THRESHOLD:
+        try:
+            import pandas as pd
+            pd.DataFrame(flattened_data).to_csv(buf, index=False)
+            return buf.getvalue()
+        except Exception:
+            logger.exception("pandas CSV serialization failed; using csv.writer")
+            buf = io.StringIO()
+    # csv.writer + itemgetter skips DictWriter's per-row lookup by field name
+    fieldnames = list(flattened_data[0].keys())
+    get_row = itemgetter(*fieldnames)
+    writer = csv.writer(buf)
+    writer.writerow(fieldnames)
+    writer.writerows(get_row(row) for row in flattened_data)
+    return buf.getvalue()
+
+
+def _dedup_interactions(user_info_list: List[dict]) -> List[dict]:
+    """Drop repeat interactions so duplicate rows never reach the sheet."""
+    seen = set()
+    deduped = []
+    for info in user_info_list:
+        url = info["website_url"]
+        kept = []
+        for interaction in info["user_info"]:
+            key = (
+                url,
+                interaction.get("username", ""),
+                interaction.get("post_type", ""),
+                interaction.get("timestamp", ""),
+                # First chunk of the bio catches near-duplicate profiles
+                (interaction.get("bio") or "")[:64],
+            )
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(interaction)
+        if kept:
+            deduped.append({"website_url": url, "user_info": kept})
+    return deduped
+
+
+def format_user_info_to_flattened_json(user_info_list: List[dict]) -> List[dict]:
+    user_info_list = _dedup_interactions(user_info_list)
+    total = sum(len(info["user_info"]) for info in user_info_list)
+    if total >= _COLUMNAR_FLATTEN_THRESHOLD:
+        try:
+            return _flatten_columnar(user_info_list, total)
+        except Exception:
+            logger.exception("Columnar flattening failed; using json_normalize")
+
+    rows = [
+        {"website_url": info["website_url"], **interaction}
+        for info in user_info_list
+        for interaction in info["user_info"]
+    ]
+    if len(rows) >= _PANDAS_FLATTEN_THRESHOLD:
+        try:
+            return _flatten_with_pandas(rows)
+        except Exception:
+            logger.exception("pandas flattening failed; using the Python loop")
+
+    # A single comprehension sizes the output list in one go and keeps the
+    # whole loop in one bytecode block; dict.get is bound once outside it.
+    get = dict.get
+    return [
+        {
+            "Website URL": row["website_url"],
+            "Username": get(row, "username", ""),
+            "Bio": get(row, "bio", ""),
+            "Post Type": get(row, "post_type", ""),
+            "Timestamp": get(row, "timestamp", ""),
+            "Upvotes": get(row, "upvotes", 0),
+            "Links": ", ".join(get(row, "links") or ()),
+        }
+        for row in rows
+    ]
 
 def _to_jsonable(obj: object) -> object:
     """Best-effort conversion of arbitrary objects to JSON-like structures for inspection."""
-    try:
-        # Pass through primitives, dicts and lists
-        if obj is None or isinstance(obj, (str, int, float, bool, dict, list)):
-            return obj
-        # pydantic/BaseModel style
-        if hasattr(obj, "model_dump") and callable(obj.model_dump):
-            return obj.model_dump()  # type: ignore
-        if hasattr(obj, "dict") and callable(obj.dict):
-            return obj.dict()  # type: ignore
-        # dataclass-like
+    # Common case first: primitives, dicts and lists pass straight through.
+    # An exact type check is one C-level lookup; nearly every input lands here.
+    if obj is None or type(obj) in (str, int, float, bool, dict, list):
+        return obj
+    # Subclasses (OrderedDict, defaultdict, ...) miss the exact-type check but
+    # are already walkable; without this they'd fall through to __dict__ and
+    # come back as an empty attribute dict instead of their contents.
+    if isinstance(obj, (dict, list, tuple)):
+        return obj
+    # pydantic/BaseModel style: a single getattr instead of hasattr pairs
+    # (hasattr swallows an AttributeError on every miss)
+    dump = getattr(obj, "model_dump", None) or getattr(obj, "dict", None)
+    if callable(dump):
         try:
-            from dataclasses import asdict, is_dataclass
-            if is_dataclass(obj):
-                return asdict(obj)
+            return dump()
         except Exception:
             pass
-        # generic object attributes
-        if hasattr(obj, "__dict__"):
-            return dict(obj.__dict__)
-    except Exception:
-        pass
-    return obj
+    # dataclass-like
+    if is_dataclass(obj):
+        return asdict(obj)
+    # generic object attributes
+    d = getattr(obj, "__dict__", None)
+    return dict(d) if d is not None else obj
+
+
+# Compiled once; these run on every Composio response parse, matching
+# directly on serialized orjson output with no decode pass.
+_SHEET_URL_RE_B = re.compile(rb"https://docs\.google\.com/spreadsheets/d/([\w-]+)")
+_SPREADSHEET_ID_RE_B = re.compile(rb"spreadsheetId\"?\s*[:=]\s*\"([\w-]+)\"")
+
+
+_SHEET_URL_FIELDS = (
+    "spreadsheetUrl",
+    "spreadsheetURL",
+    "url",
+    "sheet_url",
+    "sheetUrl",
+    "document_url",
+    "link",
+    "webViewLink",
+)
 
 
 def _extract_google_sheet_url_from_any(obj: object) -> Optional[str]:
     """Try multiple strategies to extract a Google Sheets URL from any object."""
-    # 1. If dict-like, look for common fields recursively
-    try:
-        obj = _to_jsonable(obj)
-        if isinstance(obj, dict):
+    # 1. Breadth-first walk over the structure, checking known fields first.
+    #    Iterative (explicit deque) rather than recursive: no call-frame or
+    #    try/except overhead per nesting level, and the early returns bail
+    #    out as soon as a URL-bearing field is seen. Containers are tracked
+    #    by id and the walk is capped so a self-referential or pathologically
+    #    large response degrades to the regex fallback instead of spinning.
+    root = _to_jsonable(obj)
+    stack = collections.deque([root])
+    seen_containers = set()
+    budget = 10000
+    while stack and budget > 0:
+        budget -= 1
+        cur = stack.popleft()
+        if isinstance(cur, (dict, list, tuple)):
+            if id(cur) in seen_containers:
+                continue
+            seen_containers.add(id(cur))
+        if isinstance(cur, dict):
             # Construct from spreadsheetId if available
-            sid = obj.get("spreadsheetId") or obj.get("spreadsheet_id")
+            sid = cur.get("spreadsheetId") or cur.get("spreadsheet_id")
             if isinstance(sid, str) and sid:
                 return f"https://docs.google.com/spreadsheets/d/{sid}"
             # direct fields
-            for key in (
-                "spreadsheetUrl",
-                "spreadsheetURL",
-                "url",
-                "sheet_url",
-                "sheetUrl",
-                "document_url",
-                "link",
-                "webViewLink",
-            ):
-                val = obj.get(key)
+            for key in _SHEET_URL_FIELDS:
+                val = cur.get(key)
                 if isinstance(val, str) and "docs.google.com/spreadsheets/d/" in val:
                     return val
-            # nested search
-            for v in obj.values():
-                found = _extract_google_sheet_url_from_any(v)
-                if found:
-                    return found
-        elif isinstance(obj, list):
-            for it in obj:
-                found = _extract_google_sheet_url_from_any(it)
-                if found:
-                    return found
-    except Exception:
-        pass
+            stack.extend(cur.values())
+        elif isinstance(cur, (list, tuple)):
+            stack.extend(cur)
+        elif cur is not None and not isinstance(cur, (str, int, float, bool)):
+            # Unconverted leaf (SDK model object); convert once and requeue
+            converted = _to_jsonable(cur)
+            if converted is not cur:
+                stack.append(converted)
 
-    # 2. Fallback: stringify and regex
+    # 2. Fallback: serialize once and regex the bytes directly, skipping the
+    #    UTF-8 decode of the whole blob when orjson produced it
     try:
-        text = obj if isinstance(obj, str) else json.dumps(obj, default=str)
+        blob = root.encode("utf-8", "replace") if isinstance(root, str) else _json_dumps_bytes(root)
     except Exception:
-        text = str(obj)
-    m = re.search(r"https://docs\.google\.com/spreadsheets/d/[\w-]+", text)
+        blob = str(root).encode("utf-8", "replace")
+    m = _SHEET_URL_RE_B.search(blob)
     if m:
-        return m.group(0)
-    # 3. Fallback: find spreadsheetId in text and construct URL
-    m2 = re.search(r"spreadsheetId\"?\s*[:=]\s*\"([\w-]+)\"", text)
+        return f"https://docs.google.com/spreadsheets/d/{m.group(1).decode()}"
+    # 3. Fallback: find spreadsheetId in the blob and construct URL
+    m2 = _SPREADSHEET_ID_RE_B.search(blob)
     if m2:
-        return f"https://docs.google.com/spreadsheets/d/{m2.group(1)}"
+        return f"https://docs.google.com/spreadsheets/d/{m2.group(1).decode()}"
+    return None
+
+
+@st.cache_resource(show_spinner=False)
+def _get_sheets_tool(api_key: str):
+    """Build the Composio Google Sheets tool once per API key for the session."""
+    # Deferred: the Composio SDK import is heavy and only needed at write time
+    from composio_phidata import Action, ComposioToolSet
+    toolset = ComposioToolSet(api_key=api_key)
+    return toolset.get_tools(actions=[Action.GOOGLESHEETS_SHEET_FROM_JSON])[0]
+
+
+def _prewarm_composio_toolset(composio_api_key: str):
+    """Resolve the Google Sheets tool ahead of the write step; None on failure."""
+    try:
+        return _get_sheets_tool(composio_api_key)
+    except Exception:
+        logger.debug("Composio toolset prewarm failed", exc_info=True)
+        return None
+
+
+_COMPOSIO_SIG_KEY = "composio_successful_signature"
+_COMPOSIO_DISPATCH_METHODS = ("run", "run_action", "invoke", "execute")
+
+
+def _invoke_sheets_tool_method(toolkit, method: str, payload: dict):
+    """Dispatch one (method, payload) attempt against the toolkit; None on failure."""
+    from composio_phidata import Action
+    fn = getattr(toolkit, method)
+    try:
+        if method == "run":
+            try:
+                return fn(action=Action.GOOGLESHEETS_SHEET_FROM_JSON, params=payload)
+            except TypeError:
+                # Some versions may take (action, params)
+                return fn(Action.GOOGLESHEETS_SHEET_FROM_JSON, payload)
+        if method == "run_action":
+            return fn(Action.GOOGLESHEETS_SHEET_FROM_JSON, payload)
+        return fn(action=Action.GOOGLESHEETS_SHEET_FROM_JSON, params=payload)
+    except Exception:
+        logger.debug("Composio %s dispatch failed for keys=%s", method, list(payload.keys()), exc_info=True)
+        return None
+
+
+def _invoke_sheets_tool_collection(toolkit, payload: dict):
+    """Last resort: dispatch through a 'tools' collection if the toolkit exposes one."""
+    try:
+        for t in getattr(toolkit, "tools", ()) or ():
+            t_name = getattr(t, "name", "")
+            if isinstance(t_name, str) and "GOOGLESHEETS" in t_name.upper():
+                if hasattr(t, "run"):
+                    return t.run(**payload)
+                if callable(t):
+                    return t(**payload)
+    except Exception:
+        pass
     return None
 
 
@@ -181,8 +662,9 @@ def write_to_google_sheets_via_composio(flattened_data: List[dict], composio_api
             if debug:
                 st.warning("No data to write to Google Sheets.")
             return None
-        toolset = ComposioToolSet(api_key=composio_api_key)
-        toolkit = toolset.get_tools(actions=[Action.GOOGLESHEETS_SHEET_FROM_JSON])[0]
+        toolkit = st.session_state.get("composio_sheets_tool")
+        if toolkit is None:
+            toolkit = _get_sheets_tool(composio_api_key)
         logger.info("Composio toolkit acquired: type=%s attrs=%s", type(toolkit).__name__, [a for a in dir(toolkit) if not a.startswith('_')][:30])
 
         # Prefer an explicit title; Composio often accepts "title" + "data" as list[dict]
@@ -193,51 +675,44 @@ def write_to_google_sheets_via_composio(flattened_data: List[dict], composio_api
             {"data": flattened_data},
         ]
 
+        # Reflect over the toolkit once instead of repeating hasattr chains
+        # inside the trial loop
+        available_methods = [m for m in _COMPOSIO_DISPATCH_METHODS if hasattr(toolkit, m)]
+
         result = None
         used_payload = None
-        for payload in payload_options:
-            try:
+        used_method = None
+
+        # The working (method, payload shape) pair is fixed for a given
+        # Composio SDK version, so replay the remembered signature directly
+        # before falling back to trial and error.
+        sig = st.session_state.get(_COMPOSIO_SIG_KEY)
+        if sig:
+            payload = next((p for p in payload_options if sorted(p.keys()) == sig.get("payload_keys")), None)
+            if payload is not None and sig.get("method") in available_methods:
+                result = _invoke_sheets_tool_method(toolkit, sig["method"], payload)
+                if result:
+                    used_payload, used_method = payload, sig["method"]
+
+        if not result:
+            for payload in payload_options:
                 logger.info("Calling Composio GOOGLESHEETS_SHEET_FROM_JSON with keys=%s", list(payload.keys()))
-                # Preferred signature
-                if hasattr(toolkit, "run"):
-                    try:
-                        result = toolkit.run(action=Action.GOOGLESHEETS_SHEET_FROM_JSON, params=payload)
-                    except TypeError:
-                        # Some versions may take (action, params)
-                        result = toolkit.run(Action.GOOGLESHEETS_SHEET_FROM_JSON, payload)
-                # Fallbacks
-                if result is None and hasattr(toolkit, "run_action"):
-                    result = toolkit.run_action(Action.GOOGLESHEETS_SHEET_FROM_JSON, payload)
-                if result is None and hasattr(toolkit, "invoke"):
-                    try:
-                        result = toolkit.invoke(action=Action.GOOGLESHEETS_SHEET_FROM_JSON, params=payload)
-                    except Exception:
-                        pass
-                if result is None and hasattr(toolkit, "execute"):
-                    try:
-                        result = toolkit.execute(action=Action.GOOGLESHEETS_SHEET_FROM_JSON, params=payload)
-                    except Exception:
-                        pass
-                # Last resort: if toolkit exposes a 'tools' collection
-                if result is None and hasattr(toolkit, "tools"):
-                    try:
-                        for t in getattr(toolkit, "tools"):
-                            t_name = getattr(t, "name", "")
-                            if isinstance(t_name, str) and "GOOGLESHEETS" in t_name.upper():
-                                if hasattr(t, "run"):
-                                    result = t.run(**payload)
-                                    break
-                                if callable(t):
-                                    result = t(**payload)
-                                    break
-                    except Exception:
-                        pass
+                for method in available_methods:
+                    result = _invoke_sheets_tool_method(toolkit, method, payload)
+                    if result:
+                        used_method = method
+                        break
+                if result is None:
+                    result = _invoke_sheets_tool_collection(toolkit, payload)
                 if result:
                     used_payload = payload
                     break
-            except Exception as e:
-                logger.exception("Composio call failed for payload keys=%s", list(payload.keys()))
-                continue
+
+        if result and used_method and used_payload is not None:
+            st.session_state[_COMPOSIO_SIG_KEY] = {
+                "method": used_method,
+                "payload_keys": sorted(used_payload.keys()),
+            }
 
         if not result:
             return None
@@ -249,7 +724,7 @@ def write_to_google_sheets_via_composio(flattened_data: List[dict], composio_api
             return url
         # As a last resort, stringify and search
         try:
-            text = result if isinstance(result, str) else json.dumps(result, default=str)
+            text = result if isinstance(result, str) else _json_dumps(result)
         except Exception:
             text = str(result)
         url = _extract_google_sheet_url_from_any(text)
@@ -296,6 +771,149 @@ PROMPT_TRANSFORM_INSTRUCTIONS = (
     "Always focus on the core product/service and keep it concise but clear."
 )
 
+_PROMPT_CACHE_PATH = os.path.join(".cache", "gemini", "transform_cache.json")
+_prompt_cache: Optional[dict] = None
+
+
+def _normalize_query(user_query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different inputs share a cache entry."""
+    return re.sub(r"\s+", " ", user_query.strip().lower())
+
+
+def _transform_cache_key(user_query: str) -> str:
+    raw = PROMPT_TRANSFORM_INSTRUCTIONS + "\x00" + _normalize_query(user_query)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _load_prompt_cache() -> dict:
+    global _prompt_cache
+    if _prompt_cache is None:
+        try:
+            with open(_PROMPT_CACHE_PATH, "rb") as f:
+                _prompt_cache = _json_loads(f.read())
+        except Exception:
+            _prompt_cache = {}
+    return _prompt_cache
+
+
+def _store_prompt_cache(key: str, value: str) -> None:
+    cache = _load_prompt_cache()
+    cache[key] = value
+    try:
+        os.makedirs(os.path.dirname(_PROMPT_CACHE_PATH), exist_ok=True)
+        with open(_PROMPT_CACHE_PATH, "wb") as f:
+            f.write(_json_dumps_bytes(cache))
+    except Exception:
+        # Cache persistence is best-effort; the in-memory copy still serves this session.
+        logger.debug("Could not persist prompt cache to %s", _PROMPT_CACHE_PATH)
+
+
+_SEMANTIC_CACHE_PATH = os.path.join(".cache", "gemini", "semantic_cache.pkl")
+_SEMANTIC_SIMILARITY_THRESHOLD = 0.92
+_semantic_model = None
+_semantic_cache: Optional[dict] = None
+
+
+def _get_semantic_model():
+    """Load the small local embedding model once; None if sentence-transformers is unavailable."""
+    global _semantic_model
+    if _semantic_model is None:
+        try:
+            from sentence_transformers import SentenceTransformer
+            _semantic_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+        except Exception:
+            _semantic_model = False
+    return _semantic_model or None
+
+
+def _load_semantic_cache() -> dict:
+    global _semantic_cache
+    if _semantic_cache is None:
+        try:
+            import pickle
+            with open(_SEMANTIC_CACHE_PATH, "rb") as f:
+                _semantic_cache = pickle.load(f)
+        except Exception:
+            _semantic_cache = {"embeddings": None, "outputs": []}
+    return _semantic_cache
+
+
+def _semantic_cache_lookup(user_query: str) -> Optional[str]:
+    """Return a cached concise description for a semantically equivalent query, if any."""
+    model = _get_semantic_model()
+    if model is None:
+        return None
+    cache = _load_semantic_cache()
+    if cache["embeddings"] is None or not cache["outputs"]:
+        return None
+    try:
+        q = model.encode([user_query], normalize_embeddings=True)[0]
+        scores = cache["embeddings"] @ q
+        best = int(scores.argmax())
+        if float(scores[best]) >= _SEMANTIC_SIMILARITY_THRESHOLD:
+            return cache["outputs"][best]
+    except Exception:
+        logger.debug("Semantic cache lookup failed", exc_info=True)
+    return None
+
+
+_SEMANTIC_FLUSH_DELAY_S = 30.0
+_semantic_flush_lock = threading.Lock()
+_semantic_flush_timer: Optional[threading.Timer] = None
+
+
+def _flush_semantic_cache() -> None:
+    """Write the in-memory semantic cache to disk atomically."""
+    global _semantic_flush_timer
+    with _semantic_flush_lock:
+        _semantic_flush_timer = None
+        cache = _semantic_cache
+    if not cache or cache["embeddings"] is None:
+        return
+    try:
+        import pickle
+        os.makedirs(os.path.dirname(_SEMANTIC_CACHE_PATH), exist_ok=True)
+        tmp_path = _SEMANTIC_CACHE_PATH + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(cache, f)
+        os.replace(tmp_path, _SEMANTIC_CACHE_PATH)
+    except Exception:
+        logger.debug("Could not flush semantic cache", exc_info=True)
+
+
+def _schedule_semantic_flush() -> None:
+    """Debounce disk writes: new entries within the window share one flush."""
+    global _semantic_flush_timer
+    with _semantic_flush_lock:
+        if _semantic_flush_timer is None:
+            timer = threading.Timer(_SEMANTIC_FLUSH_DELAY_S, _flush_semantic_cache)
+            timer.daemon = True
+            _semantic_flush_timer = timer
+            timer.start()
+
+
+atexit.register(_flush_semantic_cache)
+
+
+def _semantic_cache_store(user_query: str, output: str) -> None:
+    model = _get_semantic_model()
+    if model is None:
+        return
+    try:
+        import numpy as np
+        cache = _load_semantic_cache()
+        q = model.encode([user_query], normalize_embeddings=True)
+        if cache["embeddings"] is None:
+            cache["embeddings"] = q
+        else:
+            cache["embeddings"] = np.vstack([cache["embeddings"], q])
+        cache["outputs"].append(output)
+        _schedule_semantic_flush()
+    except Exception:
+        logger.debug("Could not store semantic cache entry", exc_info=True)
+
+
+@functools.lru_cache(maxsize=64)
 def get_secret(name: str) -> str:
     """Fetch a secret from Streamlit secrets (top-level or [default]) or env vars."""
     try:
@@ -309,6 +927,7 @@ def get_secret(name: str) -> str:
         pass
     return os.environ.get(name, "")
 
+@functools.lru_cache(maxsize=4)
 def _parse_gemini_keys(raw: str) -> List[str]:
     keys: List[str] = []
     # 1) UI-provided raw
@@ -326,34 +945,239 @@ def _parse_gemini_keys(raw: str) -> List[str]:
         if v:
             keys.append(v)
     # Deduplicate while preserving order
-    seen = set()
-    uniq = []
-    for k in keys:
-        if k not in seen:
-            uniq.append(k)
-            seen.add(k)
-    return uniq
+    return list(dict.fromkeys(keys))
+
+_QUERY_PREFIX_RE = re.compile(
+    r"^(?:generate leads(?: looking for)?|looking for|find (?:people|users|businesses)\s+(?:who|interested in|that)?|"
+    r"need to find|searching for|i need|i want|help me find)\s*",
+    re.IGNORECASE,
+)
+_QUERY_STOPWORDS = frozenset(
+    "a an the for of to in on with and or who that are is need want users people "
+    "businesses interested implementing looking".split()
+)
+
+
+_QUERY_FILLER_RE = re.compile(
+    r"\b(looking for|find|need|want|help me|who needs|interested in|generate leads)\b",
+    re.IGNORECASE,
+)
+
+
+def _cheap_transform(user_query: str) -> Optional[str]:
+    """Derive the concise description locally for simple queries; None means escalate to Gemini."""
+    # Already-concise inputs ("AI video editing software") need no
+    # transformation at all; pass them through verbatim.
+    stripped = user_query.strip()
+    if len(stripped.split()) <= 8 and not _QUERY_FILLER_RE.search(stripped):
+        return stripped
+    q = _QUERY_PREFIX_RE.sub("", stripped.lower())
+    q = re.sub(r"[^\w\s-]", " ", q)
+    tokens = [t for t in q.split() if t not in _QUERY_STOPWORDS]
+    if 2 <= len(tokens) <= 5:
+        return " ".join(tokens)
+    return None
+
+
+# Per-key health tracking for the interactive transform path. Module-level
+# and lock-guarded (like the breaker state), not session_state:
+# transform_with_gemini runs inside asyncio.to_thread, and Streamlit's
+# ScriptRunContext is thread-local, so session_state accessed from a worker
+# thread is a fresh throwaway object on every access.
+_KEY_EWMA_ALPHA = 0.2
+_KEY_COOLDOWN_S = 30.0
+_KEY_DEFAULT_EWMA_MS = 500.0
+_gemini_key_stats_lock = threading.Lock()
+_gemini_key_stats: dict = {}
+
+
+def _gemini_key_id(api_key: str) -> str:
+    # Hash so raw secrets never sit in the stats dict as keys
+    return hashlib.blake2b(api_key.encode(), digest_size=8).hexdigest()
+
+
+def _pick_gemini_key(api_keys: List[str]) -> str:
+    """Pick the key with the lowest smoothed latency among those not cooling down."""
+    now = time.monotonic()
+    with _gemini_key_stats_lock:
+        candidates = []
+        cooldowns = []
+        for i, key in enumerate(api_keys):
+            s = _gemini_key_stats.get(_gemini_key_id(key))
+            if s is None:
+                # Untried keys get a chance straight away
+                candidates.append((0.0, i))
+            elif s["cooldown_until"] <= now:
+                candidates.append((s["ewma_ms"], i))
+                cooldowns.append((s["cooldown_until"], i))
+            else:
+                cooldowns.append((s["cooldown_until"], i))
+        if candidates:
+            # Tie-break on list position, never on the key material itself
+            return api_keys[min(candidates)[1]]
+        # Every key is cooling down; take the one whose cooldown ends soonest
+        return api_keys[min(cooldowns)[1]]
+
+
+def _record_gemini_result(api_key: str, elapsed_ms: float, ok: bool) -> None:
+    with _gemini_key_stats_lock:
+        s = _gemini_key_stats.setdefault(
+            _gemini_key_id(api_key), {"ewma_ms": _KEY_DEFAULT_EWMA_MS, "cooldown_until": 0.0}
+        )
+        s["ewma_ms"] = (1 - _KEY_EWMA_ALPHA) * s["ewma_ms"] + _KEY_EWMA_ALPHA * elapsed_ms
+        if not ok:
+            s["cooldown_until"] = time.monotonic() + _KEY_COOLDOWN_S
+
 
 def transform_with_gemini(api_keys: List[str], user_query: str) -> str:
     if not api_keys:
         raise ValueError("No Gemini API keys provided")
-    # Round-robin rotation persisted in session
-    idx_key = "gemini_key_index"
-    if idx_key not in st.session_state:
-        st.session_state[idx_key] = 0
-    idx = st.session_state[idx_key] % len(api_keys)
-    st.session_state[idx_key] = (st.session_state[idx_key] + 1) % max(1, len(api_keys))
-
-    genai.configure(api_key=api_keys[idx])
-    model = genai.GenerativeModel("gemini-2.5-pro")
+    # Cheap local path first: short queries reduce to 3-5 keywords without an
+    # LLM round trip at all.
+    cheap = _cheap_transform(user_query)
+    if cheap:
+        return cheap
+    # Repeat queries skip the LLM round trip entirely; the cache persists on
+    # disk so it survives Streamlit reruns and restarts.
+    cache_key = _transform_cache_key(user_query)
+    cached = _load_prompt_cache().get(cache_key)
+    if cached:
+        return cached
+    # Near-duplicate queries ("AI chatbots for ecommerce" vs "chatbots powered
+    # by AI for online stores") hit the semantic tier when exact match misses.
+    semantic_hit = _semantic_cache_lookup(user_query)
+    if semantic_hit:
+        return semantic_hit
+    # Health-weighted key selection: a throttled or slow key sits out its
+    # cooldown instead of being handed every Nth request regardless.
+    # The REST endpoint skips SDK configure/model construction overhead and
+    # reuses the pooled session, so no TLS handshake per call either.
+    text = ""
+    tried = set()
+    for _ in range(min(2, len(api_keys))):
+        remaining = [k for k in api_keys if k not in tried]
+        api_key = _pick_gemini_key(remaining or api_keys)
+        tried.add(api_key)
+        start = time.monotonic()
+        text = _generate_concise_via_rest(api_key, user_query)
+        _record_gemini_result(api_key, (time.monotonic() - start) * 1000.0, ok=bool(text))
+        if text:
+            break
+    if text:
+        _semantic_cache_store(user_query, text)
+    return text
+
+_GEMINI_REST_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+
+# Cheapest model that handles the 3-4 word extraction first; Pro only as
+# the escalation path when the lite output fails the length check. Each
+# model carries its own generationConfig: Pro cannot disable thinking and
+# its thought tokens count against maxOutputTokens, so a tight cap like
+# the lite one would exhaust the budget before any visible text is emitted.
+_TRANSFORM_MODEL_CASCADE = (
+    (
+        "gemini-2.5-flash-lite",
+        {"maxOutputTokens": 20, "temperature": 0.0, "stopSequences": ["\n"]},
+    ),
+    (
+        "gemini-2.5-pro",
+        {
+            "maxOutputTokens": 1024,
+            "temperature": 0.0,
+            "stopSequences": ["\n"],
+            "thinkingConfig": {"thinkingBudget": 512},
+        },
+    ),
+)
+
+
+def _gemini_generate(api_key: str, model_name: str, prompt: str, generation_config: dict, timeout: int = 15) -> str:
+    """Call Gemini's REST generateContent endpoint directly.
+
+    Unlike genai.configure, which mutates process-global SDK state, this is
+    safe to call concurrently with a different key per thread.
+    """
+    resp = _SESSION.post(
+        _GEMINI_REST_URL.format(model=model_name),
+        params={"key": api_key},
+        json={
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": generation_config,
+        },
+        timeout=(5, timeout),
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    try:
+        return data["candidates"][0]["content"]["parts"][0]["text"].strip()
+    except (KeyError, IndexError, TypeError):
+        return ""
+
+
+def _generate_concise_via_rest(api_key: str, user_query: str) -> str:
+    """Run the Flash-then-Pro cascade over REST and cache a usable result."""
     prompt = f"{PROMPT_TRANSFORM_INSTRUCTIONS}\n\nInput: \"{user_query}\"\nOutput:"
-    resp = model.generate_content(prompt)
-    text = (resp.text or "").strip() if hasattr(resp, "text") else ""
-    # Ensure short output
+    text = ""
+    for model_name, generation_config in _TRANSFORM_MODEL_CASCADE:
+        try:
+            text = _gemini_generate(api_key, model_name, prompt, generation_config)
+        except Exception:
+            logger.exception("Gemini %s call failed", model_name)
+            text = ""
+        if 0 < len(text.split()) <= 8:
+            break
     if len(text.split()) > 8:
         text = " ".join(text.split()[:8])
+    if text:
+        _store_prompt_cache(_transform_cache_key(user_query), text)
     return text
 
+
+def _transform_one_via_rest(api_key: str, user_query: str) -> str:
+    """Transform a single query using the heuristic, caches, then the REST cascade."""
+    text = _cheap_transform(user_query)
+    if text:
+        return text
+    cached = _load_prompt_cache().get(_transform_cache_key(user_query))
+    if cached:
+        return cached
+    return _generate_concise_via_rest(api_key, user_query)
+
+
+def transform_many_with_gemini(api_keys: List[str], queries: List[str]) -> List[str]:
+    """Transform a batch of queries concurrently with one worker pinned per API key.
+
+    Per-key rate limits are independent, so N keys give up to N× throughput on
+    batch workloads. Results come back in input order.
+    """
+    if not api_keys:
+        raise ValueError("No Gemini API keys provided")
+    if not queries:
+        return []
+
+    work: "queue.Queue" = queue.Queue()
+    for item in enumerate(queries):
+        work.put(item)
+    results: List[str] = [""] * len(queries)
+
+    def _worker(api_key: str) -> None:
+        while True:
+            try:
+                idx, q = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[idx] = _transform_one_via_rest(api_key, q)
+            except Exception:
+                logger.exception("Batch transform failed for query index %d", idx)
+
+    workers = min(len(api_keys), len(queries))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = [ex.submit(_worker, api_keys[i]) for i in range(workers)]
+        concurrent.futures.wait(futures)
+    return results
+
+
 def main():
     st.title("🎯 AI Lead Generation Agent")
     st.info("This firecrawl powered agent helps you generate leads from Quora by searching for relevant posts and extracting user information.")
@@ -380,6 +1204,9 @@ def main():
         show_debug = st.checkbox("Show Composio debug output", value=False)
 
         if st.button("Reset"):
+            get_secret.cache_clear()
+            _parse_gemini_keys.cache_clear()
+            st.cache_data.clear()
             st.session_state.clear()
             st.experimental_rerun()
 
@@ -406,26 +1233,59 @@ def main():
             return
         else:
             with st.spinner("Processing your query..."):
-                try:
-                    concise = transform_with_gemini(gemini_keys, user_query)
-                except Exception as e:
-                    st.error(f"Gemini transform failed: {e}")
+                # The Gemini transform and the Composio tool discovery are
+                # independent network calls; overlap them instead of paying
+                # both round trips back to back.
+                async def _prepare():
+                    return await asyncio.gather(
+                        asyncio.to_thread(transform_with_gemini, gemini_keys, user_query),
+                        asyncio.to_thread(_prewarm_composio_toolset, composio_api_key),
+                        return_exceptions=True,
+                    )
+
+                concise, prewarmed_tool = asyncio.run(_prepare())
+                if isinstance(concise, Exception):
+                    st.error(f"Gemini transform failed: {concise}")
+                    return
+                if not concise:
+                    # Every key/model attempt came back empty; searching with
+                    # a blank description would just burn a Firecrawl call.
+                    st.error("Gemini could not produce a concise description for your query. Please try again or rephrase it.")
                     return
+                if prewarmed_tool is not None and not isinstance(prewarmed_tool, Exception):
+                    st.session_state["composio_sheets_tool"] = prewarmed_tool
                 st.write("🎯 Searching for:", concise)
             
+            if _breaker_is_open():
+                st.warning("Firecrawl has been failing repeatedly; pausing new calls briefly. Try again in ~30 seconds.")
+                return
+
             with st.spinner("Searching for relevant URLs..."):
-                urls = search_for_urls(concise, firecrawl_api_key, num_links)
+                try:
+                    urls = search_for_urls(concise, firecrawl_api_key, num_links)
+                except Exception as exc:
+                    st.error(f"Firecrawl search failed: {exc}")
+                    return
             
             if urls:
                 st.subheader("Quora Links Used:")
                 for url in urls:
                     st.write(url)
                 
-                with st.spinner("Extracting user info from URLs..."):
-                    user_info_list = extract_user_info_from_urls(urls, firecrawl_api_key)
-                
-                with st.spinner("Formatting user info..."):
-                    flattened_data = format_user_info_to_flattened_json(user_info_list)
+                # Live per-URL progress instead of an opaque spinner; the
+                # fan-out reports completions back on this thread.
+                extract_status = st.empty()
+                extract_status.markdown(f"Extracting user info… 0/{len(urls)} URLs")
+
+                def _on_extract_progress(done: int, total: int) -> None:
+                    extract_status.markdown(f"Extracting user info… {done}/{total} URLs")
+
+                user_info_list = extract_user_info_from_urls(
+                    urls, firecrawl_api_key, progress_callback=_on_extract_progress
+                )
+                extract_status.markdown(f"Extracted user info from {len(user_info_list)} of {len(urls)} URLs")
+
+                flattened_data = format_user_info_to_flattened_json(user_info_list)
 
                 google_sheets_link: Optional[str] = None
                 if not flattened_data:
@@ -447,17 +1307,10 @@ def main():
                     st.error("Failed to retrieve the Google Sheets link.")
                     # Fallback: offer CSV download
                     try:
-                        import io, csv
-                        csv_buf = io.StringIO()
                         if flattened_data:
-                            fieldnames = list(flattened_data[0].keys())
-                            writer = csv.DictWriter(csv_buf, fieldnames=fieldnames)
-                            writer.writeheader()
-                            for row in flattened_data:
-                                writer.writerow(row)
                             st.download_button(
                                 label="Download CSV",
-                                data=csv_buf.getvalue(),
+                                data=_build_csv(flattened_data),
                                 file_name=(sheet_title.strip() or "AI Leads").replace(" ", "_") + ".csv",
                                 mime="text/csv",
                             )